@@ -5,27 +5,56 @@ Contains all configurable parameters including Ollama settings,
 model parameters, and prompt templates.
 """
 
+import os
+
 # Ollama API Configuration
 OLLAMA_API_URL = "http://localhost:11434/api/generate"
+OLLAMA_CHAT_URL = "http://localhost:11434/api/chat"
 MODEL_NAME = "llama3.1:8b"
+OLLAMA_TIMEOUT = 120  # Seconds to wait for a response (per streamed chunk)
+OLLAMA_CONNECT_TIMEOUT = 5  # Seconds to wait for the connection to Ollama
+OLLAMA_POOL_SIZE = 16  # Keep-alive connections kept open to Ollama
+OLLAMA_RETRIES = 2  # Extra attempts on connection errors or 5xx responses, before any tokens arrive
+OLLAMA_RETRY_BACKOFF = 0.5  # Seconds to wait before the first retry, doubled for each further attempt
 
 # Model Generation Parameters
+# Sampling settings belong under "options"; Ollama ignores them at the top level
 MODEL_PARAMETERS = {
-    "temperature": 0.7,  # Creativity level (0.0-1.0)
-    "top_p": 0.9,       # Diversity control (0.0-1.0)
     "stream": False,    # Whether to stream responses
+    "keep_alive": "30m",  # Keep the model loaded between requests
+    "options": {
+        "temperature": 0.6,  # Creativity level (0.0-1.0)
+        "top_p": 0.9,       # Diversity control (0.0-1.0)
+        "num_ctx": 4096,  # Context window: room for resume + job description + letter (fixed, changing it reloads the model)
+    },
+}
+
+# Extra options for cover letter requests (generation and personalization)
+LETTER_OPTIONS = {
+    "num_predict": 400,  # Hard cap on generated tokens, ~2x the MAX_WORD_LIMIT of 200 words
 }
 
 # UI Configuration
-TYPING_SPEED = 0.03  # Speed for typing animation effect
+RENDER_BATCH_CHARS = 20  # Characters streamed between display updates (0 renders once when complete)
+RENDER_INTERVAL = 0.1  # Minimum seconds between display updates, unless a paragraph just ended
 MAX_WORD_LIMIT = 200  # Maximum words for cover letter
+DOWNLOAD_FILE_NAME = "cover_letter.txt"  # Default name for the downloaded letter
+
+# Prompt input budgets (words, roughly 1.3 tokens each); longer inputs are cut so the
+# prompt plus the letter stays inside the model's context window
+RESUME_WORD_BUDGET = 1000
+JOB_DESCRIPTION_WORD_BUDGET = 1000
 
 # File Processing Configuration
 SUPPORTED_FILE_TYPES = ["pdf", "docx", "txt"]
-TEMP_FILE_PREFIX = "cover_letter_temp_"
+PDF_WORKERS = 2  # Worker processes for PDF extraction (resume and job description in parallel)
+DEBUG_DUMP = os.getenv("DEBUG_DUMP", "").lower() in ("1", "true", "yes")  # Write intermediate extraction and cleaning results to the working directory
+LOG_LEVEL = os.getenv("LOG_LEVEL", "WARNING").upper()  # Set LOG_LEVEL=debug to log prompt sizes
 
 # Prompt Templates
-COVER_LETTER_PROMPT_TEMPLATE = """
+# The instructions never change between requests, so they are filled in once here and
+# sent as a byte-identical system message; Ollama can then reuse its cache for them
+COVER_LETTER_SYSTEM_PROMPT = """
 You are a professional cover letter writer. Write a compelling, personalized cover letter based on the resume and job description provided.
 
 ⚠️ Important instructions:
@@ -42,7 +71,10 @@ The goal is to create a professional, eager-to-learn, and concise cover letter.
 
     
     Include the resume and job description below and generate the cover letter formatted as an email.
+""".format(word_limit=MAX_WORD_LIMIT)
 
+# Request-specific part of the prompt, sent as the user message after COVER_LETTER_SYSTEM_PROMPT
+COVER_LETTER_PROMPT_TEMPLATE = """
 📄 Resume:
 \"\"\"
 {resume_text}
@@ -56,15 +88,24 @@ The goal is to create a professional, eager-to-learn, and concise cover letter.
 ✍️ Now, write the best possible cover letter based on these.
 """
 
-PERSONALIZATION_PROMPT_TEMPLATE = """
-You are a professional cover letter writer. Here is the current cover letter:
-
-{current_cover_letter}
+# Used when the resume is raw text extracted from an uploaded file: the model
+# normalizes it while writing the letter instead of in a separate cleaning request.
+# Appended to the cover letter template so both prompts share the same prefix.
+COMBINED_PROMPT_TEMPLATE = COVER_LETTER_PROMPT_TEMPLATE + """
+Note: the resume above was extracted automatically from a file and may contain formatting artifacts
+(broken lines, stray symbols, irregular spacing or ordering). Internally normalize it before using it,
+but output only the cover letter.
+"""
 
+# Personalization continues the generation chat: the system prompt, the resume and job
+# description turn and the latest letter, plus one user turn built from this template.
+# Ollama reuses its cache for the unchanged system + resume prefix
+PERSONALIZATION_PROMPT_TEMPLATE = """
 The user has requested the following personalization:
 {user_request}
 
 Please update the cover letter accordingly, keeping it concise, short and professional.
+Reply with the full updated cover letter only.
 """
 
 RESUME_CLEANING_PROMPT_TEMPLATE = """
@@ -94,6 +135,7 @@ UI_MESSAGES = {
     "personalization_input": "Ask to personalize or modify your cover letter (e.g., 'Make it more formal', 'Add a sentence about teamwork'):",
     "personalization_button": "Submit Personalization",
     "personalization_header": "Personalize Your Cover Letter Further",
+    "download_button": "📥 Download Cover Letter",
     
     # Status messages
     "resume_ready": "✅ Resume ready!",
@@ -108,7 +150,6 @@ UI_MESSAGES = {
     
     # Loading messages
     "generating_letter": "Generating your personalized cover letter...",
-    "cleaning_resume": "Cleaning and processing your resume...",
     "personalizing_letter": "Personalizing your cover letter...",
     "Note": "Please review the generated cover letter before using or sending it. "
         "While AI helps create a solid draft, it may include inaccuracies or overlook specific details. "
@@ -116,29 +157,31 @@ UI_MESSAGES = {
 }
 
 # Styling Configuration
+# The CSS is injected once per run; each streamed update only re-sends the short
+# class-based wrapper around the letter text
 COVER_LETTER_STYLE = {
-    "container": """
-    <div style='display: flex; justify-content: center; margin-top: 20px;'>
-        <div style='max-width: 800px; background-color: #f8f9fa; padding: 20px;
+    "css": """
+    <style>
+    .cover-letter-wrap { display: flex; justify-content: center; margin-top: 20px; }
+    .cover-letter { max-width: 800px; background-color: #f8f9fa; padding: 20px;
                     border-radius: 10px; font-family: Arial, sans-serif;
-                    white-space: pre-wrap; line-height: 1.6; font-size: 16px; color: #333;'>
+                    white-space: pre-wrap; line-height: 1.6; font-size: 16px; color: #333; }
+    </style>
     """,
+    "container": "<div class='cover-letter-wrap'><div class='cover-letter'>",
     "container_end": "</div></div>"
 }
 
 # Session State Keys
 SESSION_KEYS = {
     "cover_letter_placeholder": "cover_letter_placeholder",
-    "processed_resume_text": "processed_resume_text",
-    "processed_job_description": "processed_job_description",
-    "last_resume_file_name": "last_resume_file_name",
-    "last_job_file_name": "last_job_file_name",
     "generated_cover_letter": "generated_cover_letter",
     "cover_letter_generated": "cover_letter_generated",
     "chat_history": "chat_history",
     "current_displayed_letter": "current_displayed_letter",
     "resume_text_input": "resume_text_input",
     "job_description_input": "job_description_input",
+    "model_warmed": "model_warmed",
 }
 
 # Error Messages
@@ -146,6 +189,7 @@ ERROR_MESSAGES = {
     "ollama_connection": "Error connecting to Ollama. Please ensure Ollama is running and the model is available.",
     "file_processing": "Error processing file. Please check the file format and try again.",
     "pdf_extraction": "Error extracting PDF. Using fallback extraction method.",
+    "pdf_no_text": "No text could be extracted from this PDF. If it is a scanned image, install the OCR extras (Pillow, pytesseract and Tesseract); otherwise paste the text instead.",
     "api_error": "API Error: {status_code}, {error_text}",
     "general_error": "An error occurred: {error}",
 }
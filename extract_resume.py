@@ -1,45 +1,89 @@
 import fitz  # PyMuPDF
-import pdfplumber
-from pdfminer.layout import LAParams
-from pdfminer.high_level import extract_text
-import camelot
 import re
-from PIL import Image
-import pytesseract
 import io
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from config import DEBUG_DUMP
 
-def method1_pymupdf_improved(pdf_path):
+logger = logging.getLogger(__name__)
+
+# Below this many characters the PyMuPDF result is treated as a failed extraction
+MIN_EXTRACTED_CHARS = 50
+
+# Patterns used by the post-processing helpers, compiled once at import
+_WS_RE = re.compile(r'\s+')
+_CAMEL_RE = re.compile(r'(\w)([A-Z])')
+_PARA_RE = re.compile(r'\n\s*\n')
+
+# Common resume section headers: one alternation, one named group per section
+_SECTION_RE = re.compile(
+    r'^(?:'
+    r'(?P<contact>contact|phone|email|address)'
+    r'|(?P<education>education|degree|university|college)'
+    r'|(?P<experience>experience|work|employment|career)'
+    r'|(?P<skills>skills|technical|competencies)'
+    r'|(?P<summary>summary|objective|overview|profile)'
+    r')\b',
+    re.IGNORECASE
+)
+
+# Longer lines are body text, even if they start with a section keyword
+MAX_SECTION_HEADER_LENGTH = 40
+
+def open_pdf(pdf_path):
     """
-    PyMuPDF with better text extraction using text blocks and positioning
+    Open a PDF with PyMuPDF from a file path or from the PDF's raw bytes
     """
-    doc = fitz.open(pdf_path)
-    full_text = ""
+    if isinstance(pdf_path, (bytes, bytearray)):
+        return fitz.open(stream=pdf_path, filetype="pdf")
+    return fitz.open(pdf_path)
+
+def _as_file(pdf_path):
+    """
+    Wrap raw PDF bytes in a file object for libraries that take a path or file
+    """
+    if isinstance(pdf_path, (bytes, bytearray)):
+        return io.BytesIO(pdf_path)
+    return pdf_path
+
+def method1_pymupdf_improved(pdf_path, doc=None):
+    """
+    PyMuPDF with better text extraction using text blocks and positioning.
+    Pass an already open `doc` to reuse it; it is then left open.
+    """
+    close_after = doc is None
+    if close_after:
+        doc = open_pdf(pdf_path)
+    # Collect pieces and join once; repeated str += is quadratic on large PDFs
+    parts = []
     
     for page_num in range(doc.page_count):
         page = doc[page_num]
         
-        # Method 1a: Extract text blocks (preserves some layout)
-        text_blocks = page.get_text("blocks")
+        # Method 1a: Extract text blocks (preserves some layout),
+        # sorted top to bottom, left to right by MuPDF itself
+        text_blocks = page.get_text("blocks", sort=True)
         
-        # Sort blocks by their position (top to bottom, left to right)
-        text_blocks.sort(key=lambda block: (block[1], block[0]))
+        # Text blocks only (not images)
+        parts.extend(block[4] + "\n" for block in text_blocks if block[6] == 0)
         
-        page_text = ""
-        for block in text_blocks:
-            if block[6] == 0:  # Text block (not image)
-                page_text += block[4] + "\n"
-        
-        full_text += page_text + "\n"
+        parts.append("\n")
     
-    doc.close()
-    return full_text
+    if close_after:
+        doc.close()
+    return "".join(parts)
 
-def method2_pymupdf_dict(pdf_path):
+def method2_pymupdf_dict(pdf_path, doc=None):
     """
-    PyMuPDF with dictionary output for better structure preservation
+    PyMuPDF with dictionary output for better structure preservation.
+    Pass an already open `doc` to reuse it; it is then left open.
     """
-    doc = fitz.open(pdf_path)
-    full_text = ""
+    close_after = doc is None
+    if close_after:
+        doc = open_pdf(pdf_path)
+    parts = []
     
     for page_num in range(doc.page_count):
         page = doc[page_num]
@@ -51,51 +95,49 @@ def method2_pymupdf_dict(pdf_path):
         for block in text_dict["blocks"]:
             if "lines" in block:
                 for line in block["lines"]:
-                    line_text = ""
-                    for span in line["spans"]:
-                        line_text += span["text"]
-                    full_text += line_text + "\n"
-                full_text += "\n"
+                    parts.append("".join(span["text"] for span in line["spans"]) + "\n")
+                parts.append("\n")
     
-    doc.close()
-    return full_text
+    if close_after:
+        doc.close()
+    return "".join(parts)
 
 def method3_pdfplumber(pdf_path):
     """
     PDFPlumber - Often better for layout preservation
     """
+    import pdfplumber
+    
     full_text = ""
-    with pdfplumber.open(pdf_path) as pdf:
+    with pdfplumber.open(_as_file(pdf_path)) as pdf:
         for page in pdf.pages:
             # Extract text with layout preservation
             text = page.extract_text(layout=True)
             if text:
                 full_text += text + "\n\n"
     
-    # Save to text file
-    with open("extracted_text.txt", "w", encoding="utf-8") as f:
-        f.write(full_text)
+    # Save to text file when debugging extraction
+    if DEBUG_DUMP:
+        with open("extracted_text.txt", "w", encoding="utf-8") as f:
+            f.write(full_text)
     return full_text
 
 def method4_pdfminer(pdf_path):
     """
-    PDFMiner with custom layout parameters
+    PDFMiner with its default layout parameters (the custom margins were
+    slower without improving resume text)
     """
-    laparams = LAParams(
-        boxes_flow=0.5,
-        word_margin=0.1,
-        char_margin=2.0,
-        line_margin=0.5,
-        all_texts=False
-    )
+    from pdfminer.high_level import extract_text
     
-    text = extract_text(pdf_path, laparams=laparams)
+    text = extract_text(_as_file(pdf_path))
     return text
 
 def method5_camelot_tables(pdf_path):
     """
     Camelot for table extraction (if resume has tabular data)
     """
+    import camelot
+    
     try:
         tables = camelot.read_pdf(pdf_path, pages='all')
         
@@ -108,11 +150,17 @@ def method5_camelot_tables(pdf_path):
     except Exception as e:
         return f"Error extracting tables: {str(e)}"
 
-def method6_ocr_fallback(pdf_path):
+def method6_ocr_fallback(pdf_path, doc=None):
     """
-    OCR fallback using Tesseract (for image-based PDFs or better accuracy)
+    OCR fallback using Tesseract (for image-based PDFs or better accuracy).
+    Pass an already open `doc` to reuse it; it is then left open.
     """
-    doc = fitz.open(pdf_path)
+    from PIL import Image
+    import pytesseract
+    
+    close_after = doc is None
+    if close_after:
+        doc = open_pdf(pdf_path)
     full_text = ""
     
     for page_num in range(doc.page_count):
@@ -128,7 +176,8 @@ def method6_ocr_fallback(pdf_path):
         text = pytesseract.image_to_string(image)
         full_text += text + "\n\n"
     
-    doc.close()
+    if close_after:
+        doc.close()
     return full_text
 
 def method7_hybrid_approach(pdf_path):
@@ -137,20 +186,31 @@ def method7_hybrid_approach(pdf_path):
     """
     results = {}
     
-    # Try different methods
-    methods = [
-        ("PyMuPDF Improved", method1_pymupdf_improved),
-        ("PyMuPDF Dict", method2_pymupdf_dict),
+    def run(name, method):
+        try:
+            text = method(pdf_path)
+            print(f"{name}: {len(text)} characters extracted")
+            return text
+        except Exception as e:
+            return f"Error: {str(e)}"
+    
+    # PDFPlumber and PDFMiner work from the path and run in worker threads
+    path_methods = [
         ("PDFPlumber", method3_pdfplumber),
         ("PDFMiner", method4_pdfminer),
     ]
     
-    for name, method in methods:
-        try:
-            results[name] = method(pdf_path)
-            print(f"{name}: {len(results[name])} characters extracted")
-        except Exception as e:
-            results[name] = f"Error: {str(e)}"
+    with ThreadPoolExecutor(max_workers=len(path_methods)) as executor:
+        futures = {name: executor.submit(run, name, method) for name, method in path_methods}
+        
+        # Meanwhile open the PDF once and share it between the PyMuPDF methods.
+        # PyMuPDF documents are not thread-safe, so these stay on this thread.
+        with open_pdf(pdf_path) as doc:
+            results["PyMuPDF Improved"] = run("PyMuPDF Improved", partial(method1_pymupdf_improved, doc=doc))
+            results["PyMuPDF Dict"] = run("PyMuPDF Dict", partial(method2_pymupdf_dict, doc=doc))
+        
+        for name, future in futures.items():
+            results[name] = future.result()
     
     return results
 
@@ -159,14 +219,13 @@ def clean_extracted_text(text):
     Clean up extracted text to improve readability
     """
     # Remove excessive whitespace
-    text = re.sub(r'\s+', ' ', text)
+    text = _WS_RE.sub(' ', text)
     
-    # Fix common extraction issues
-    text = re.sub(r'(\w)([A-Z])', r'\1 \2', text)  # Add space between words
-    text = re.sub(r'([a-z])([A-Z])', r'\1 \2', text)  # camelCase separation
+    # Fix common extraction issues: add space between words (also covers camelCase)
+    text = _CAMEL_RE.sub(r'\1 \2', text)
     
     # Remove extra newlines but preserve paragraph structure
-    text = re.sub(r'\n\s*\n', '\n\n', text)
+    text = _PARA_RE.sub('\n\n', text)
     
     return text.strip()
 
@@ -176,15 +235,6 @@ def extract_resume_sections(text):
     """
     sections = {}
     
-    # Common resume section headers
-    section_patterns = {
-        'contact': r'(contact|phone|email|address)',
-        'education': r'(education|degree|university|college)',
-        'experience': r'(experience|work|employment|career)',
-        'skills': r'(skills|technical|competencies)',
-        'summary': r'(summary|objective|overview|profile)'
-    }
-    
     current_section = 'general'
     sections[current_section] = []
     
@@ -202,61 +252,107 @@ def extract_resume_sections(text):
         if not line:
             continue
             
-        # Check if line is a section header
-        section_found = False
-        for section_name, pattern in section_patterns.items():
-            if re.search(pattern, line.lower()):
-                current_section = section_name
-                sections[current_section] = []
-                section_found = True
-                break
+        # Check if line is a section header: short and starting with a section keyword
+        match = _SECTION_RE.match(line) if len(line) < MAX_SECTION_HEADER_LENGTH else None
+        if match:
+            current_section = match.lastgroup
+            sections[current_section] = []
+            continue
         
-        if not section_found:
-            if current_section not in sections:
-                sections[current_section] = []
-            sections[current_section].append(line)
+        if current_section not in sections:
+            sections[current_section] = []
+        sections[current_section].append(line)
     
     return sections
 
+def has_text_layer(pdf_path, max_pages=3, doc=None):
+    """
+    Cheap probe: True if any of the first `max_pages` pages has extractable text.
+    Pass an already open `doc` to reuse it; it is then left open.
+    """
+    close_after = doc is None
+    if close_after:
+        doc = open_pdf(pdf_path)
+    try:
+        return any(doc[page_num].get_text().strip() for page_num in range(min(max_pages, doc.page_count)))
+    finally:
+        if close_after:
+            doc.close()
+
+def extract_debug(pdf_path):
+    """
+    Run every extraction method and print a preview of each result for comparison.
+    Not used by the app; call it manually when evaluating extraction quality.
+    """
+    results = method7_hybrid_approach(pdf_path)
+    
+    for method_name, text in results.items():
+        print(f"\n{'='*50}")
+        print(f"METHOD: {method_name}")
+        print(f"{'='*50}")
+        if isinstance(text, str):
+            preview = text[:500] + "..." if len(text) > 500 else text
+            print(preview)
+        else:
+            print(str(text))
+    
+    return results
+
 def extract(pdf_path):
     """
-    Main extraction function with proper error handling
+    Main extraction function with proper error handling.
+    `pdf_path` is a file path or the PDF's raw bytes. Returns "" when no text could be
+    extracted. Path results are cached until the file's mtime or size changes; bytes are
+    not cached here, since the app already caches uploads by content.
     """
     try:
-        # Try the hybrid approach to compare results
-        results = method7_hybrid_approach(pdf_path)
-        
-        # # Print results from each method
-        # for method_name, text in results.items():
-        #     print(f"\n{'='*50}")
-        #     print(f"METHOD: {method_name}")
-        #     print(f"{'='*50}")
-        #     if isinstance(text, str):
-        #         preview = text[:500] + "..." if len(text) > 500 else text
-        #         print(preview)
-        #     else:
-        #         print(str(text))
-        
-        # # For immediate use, try PDFPlumber first (often best for resumes)
-        # print("\n" + "="*50)
-        # print("RECOMMENDED: PDFPlumber Result")
-        # print("="*50)
+        if isinstance(pdf_path, (bytes, bytearray)):
+            return _extract(pdf_path)
+        stat = os.stat(pdf_path)
+        return _extract_cached(pdf_path, stat.st_mtime_ns, stat.st_size)
+    except Exception as e:
+        # Caught outside the cache, so a failure (e.g. a file read mid-write) is retried next call
+        logger.warning("Error in extract function: %s", e)
+        return ""
+
+@lru_cache(maxsize=32)
+def _extract_cached(pdf_path, mtime_ns, size):
+    """
+    Cache entry for extract() on file paths; `mtime_ns` and `size` only take part in the key.
+    Errors propagate, so only successful extractions are cached
+    """
+    return _extract(pdf_path)
+
+def _extract(pdf_path):
+    """
+    Pick and run the extraction method for a file path or raw bytes; raises on failure
+    """
+    # Open the PDF once for the probe, OCR and the primary PyMuPDF extraction
+    with open_pdf(pdf_path) as doc:
+        # Image-only PDFs have nothing for the text methods to find, so OCR them directly
+        if not has_text_layer(pdf_path, doc=doc):
+            try:
+                return method6_ocr_fallback(pdf_path, doc=doc)
+            except (ImportError, OSError) as e:
+                # OCR needs the optional Pillow, pytesseract and tesseract binary; return no text
+                # rather than an error string that would end up in the prompt
+                logger.warning("OCR unavailable: %s", e)
+                return ""
         
+        # PyMuPDF first (C-backed, several times faster); PDFPlumber when it finds next to nothing
+        best_result = ""
         try:
-            best_result = method3_pdfplumber(pdf_path)
-            # if isinstance(best_result, str):
-            #     best_result = clean_extracted_text(best_result)
-            #     best_result = extract_resume_sections(best_result)
-            return best_result
+            best_result = method1_pymupdf_improved(pdf_path, doc=doc)
+            if len(best_result.strip()) >= MIN_EXTRACTED_CHARS:
+                return best_result
         except Exception as e:
-            print(f"Error with PDFPlumber: {e}")
-            print("Falling back to improved PyMuPDF...")
-            fallback_result = method1_pymupdf_improved(pdf_path)
-            if isinstance(fallback_result, str):
-                fallback_result = clean_extracted_text(fallback_result)
-                fallback_result = extract_resume_sections(fallback_result)
-            return fallback_result
+            logger.warning("Error with PyMuPDF: %s", e)
     
+    logger.info("Falling back to PDFPlumber...")
+    try:
+        # The LLM takes the whole resume as one string, so no sectioning here
+        return method3_pdfplumber(pdf_path)
     except Exception as e:
-        print(f"Error in extract function: {e}")
-        return f"Error extracting PDF: {str(e)}"
\ No newline at end of file
+        # pdfplumber is optional; keep whatever PyMuPDF found
+        logger.warning("PDFPlumber fallback failed: %s", e)
+        return best_result
@@ -7,25 +7,46 @@ It is designed to create a concise, professional cover letter that highlights re
 It is recommended to run this script in an environment where the Ollama API is accessible."""
 
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import requests
+from requests.adapters import HTTPAdapter
 import json
+import logging
 import html
-from extract_resume import extract
-from resume_cleaner import clean_resume
-import fitz # PyMuPDF
+import io
+import re
 import time
-import tempfile
-import os
-from docx import Document
+import threading
+import atexit
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    import orjson  # Optional, faster JSON encoding and decoding
+except ImportError:
+    orjson = None
 
 # Import configuration
 from config import (
     OLLAMA_API_URL,
+    OLLAMA_CHAT_URL,
+    OLLAMA_TIMEOUT,
+    OLLAMA_CONNECT_TIMEOUT,
+    OLLAMA_POOL_SIZE,
+    OLLAMA_RETRIES,
+    OLLAMA_RETRY_BACKOFF,
     MODEL_NAME,
     MODEL_PARAMETERS,
-    TYPING_SPEED,
-    MAX_WORD_LIMIT,
+    LETTER_OPTIONS,
+    RENDER_BATCH_CHARS,
+    RENDER_INTERVAL,
+    DOWNLOAD_FILE_NAME,
+    RESUME_WORD_BUDGET,
+    JOB_DESCRIPTION_WORD_BUDGET,
+    COVER_LETTER_SYSTEM_PROMPT,
     COVER_LETTER_PROMPT_TEMPLATE,
+    COMBINED_PROMPT_TEMPLATE,
     PERSONALIZATION_PROMPT_TEMPLATE,
     UI_MESSAGES,
     COVER_LETTER_STYLE,
@@ -33,9 +54,24 @@ from config import (
     ERROR_MESSAGES,
     FILE_TYPE_MAPPINGS,
     SUPPORTED_FILE_TYPES,
-    TEMP_FILE_PREFIX
+    PDF_WORKERS,
+    LOG_LEVEL
 )
 
+logger = logging.getLogger(__name__)
+# Configure only this module's logger; unknown level names fall back to WARNING
+_log_level = logging.getLevelName(LOG_LEVEL)
+logger.setLevel(_log_level if isinstance(_log_level, int) else logging.WARNING)
+if not logger.handlers:  # The script reruns on every interaction; add the handler once
+    logger.addHandler(logging.StreamHandler())
+
+# Ollama request bodies and streamed chunks go through orjson when it is installed
+def _json_dumps(obj) -> bytes:
+    return orjson.dumps(obj) if orjson else json.dumps(obj).encode("utf-8")
+
+_json_loads = orjson.loads if orjson else json.loads
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
 # page configuration
 st.set_page_config( 
     page_title=UI_MESSAGES["app_title"],
@@ -44,177 +80,330 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+_WORD_RE = re.compile(r"\S+")
+
+def trim_to_word_budget(text: str, max_words: int) -> str:
+    """Cut text after `max_words` words, keeping its original line breaks and spacing."""
+    for index, match in enumerate(_WORD_RE.finditer(text)):
+        if index == max_words:
+            return text[:match.start()].rstrip()
+    return text
+
 def generate_cover_letter_prompt(resume_text: str, job_description: str) -> str:
-    """Generate the prompt for cover letter creation using the template from config."""
-    return COVER_LETTER_PROMPT_TEMPLATE.format(
-        resume_text=resume_text,
-        job_description=job_description,
-        word_limit=MAX_WORD_LIMIT
-    )
+    """Generate the user message for cover letter creation using the template from config."""
+    return COVER_LETTER_PROMPT_TEMPLATE.format_map({
+        "resume_text": trim_to_word_budget(resume_text, RESUME_WORD_BUDGET),
+        "job_description": trim_to_word_budget(job_description, JOB_DESCRIPTION_WORD_BUDGET),
+    })
+
+def generate_combined_prompt(raw_resume_text: str, job_description: str) -> str:
+    """Generate a cover letter prompt that also has the model normalize raw extracted resume text,
+    replacing a separate resume cleaning request."""
+    return COMBINED_PROMPT_TEMPLATE.format_map({
+        "resume_text": trim_to_word_budget(raw_resume_text, RESUME_WORD_BUDGET),
+        "job_description": trim_to_word_budget(job_description, JOB_DESCRIPTION_WORD_BUDGET),
+    })
+
+def _needs_cleaning(text: str) -> bool:
+    """Cheap check for messy PDF extractions: unprintable characters, text with
+    barely any line breaks, or long runs of layout spaces."""
+    printable = sum(c.isprintable() or c in "\n\t" for c in text)
+    ratio = printable / max(1, len(text))
+    lines = text.count("\n")
+    return ratio < 0.95 or lines < 5 or " " * 10 in text
 
-def read_file(file, file_type: int):
+def read_file(file):
     """Read and process uploaded files based on their type."""
     if file is None:
         return ""
     
-    if file.type == "application/pdf":
-        # Save uploaded file to temporary location
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf', prefix=TEMP_FILE_PREFIX) as tmp_file:
-            file.seek(0)  # Reset file pointer to beginning
-            tmp_file.write(file.read())
-            temp_pdf_path = tmp_file.name
-        
+    return read_file_bytes(file.getvalue(), file.type)
+
+@st.cache_resource
+def _pdf_pool_state():
+    """Holder for the current PDF worker pool, replaced when a pool breaks."""
+    state = {"pool": None, "lock": threading.Lock()}
+
+    def shutdown():
+        if state["pool"] is not None:
+            state["pool"].shutdown(wait=False)
+
+    # One exit hook per server: stop whichever pool is current instead of leaving
+    # the workers to the interpreter teardown
+    atexit.register(shutdown)
+    return state
+
+def get_pdf_pool():
+    """Shared worker processes for PDF extraction, so parsing is CPU-parallel and
+    never holds the GIL of the Streamlit server."""
+    state = _pdf_pool_state()
+    with state["lock"]:
+        if state["pool"] is None:
+            # Spawn rather than fork: the server process is multithreaded
+            state["pool"] = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return state["pool"]
+
+def _reset_pdf_pool(pool):
+    """Drop a broken pool so the next PDF starts a fresh one."""
+    state = _pdf_pool_state()
+    with state["lock"]:
+        # Another session may already have replaced it
+        if state["pool"] is pool:
+            state["pool"] = None
+    pool.shutdown(wait=False)
+
+def _read_pdf(file_bytes: bytes):
+    """Extract text from a PDF."""
+    # extract_resume imports PyMuPDF, so load it only once a PDF is actually uploaded
+    from extract_resume import extract
+    pool = get_pdf_pool()
+    try:
+        # Extract straight from the uploaded bytes in a worker process, no temporary file needed
+        text = pool.submit(extract, file_bytes).result()
+    except Exception as e:
+        # extract() logs its own failures and returns "", so only a failure of the pool
+        # itself (a dead worker, workers that cannot start) gets here
+        if isinstance(e, BrokenProcessPool):
+            # A broken pool never recovers
+            _reset_pdf_pool(pool)
+        st.warning(ERROR_MESSAGES["pdf_extraction"])
+        # Fallback to simple in-process PyMuPDF extraction
         try:
-            # Call your existing extract function with the temporary file path
-            extracted_text = extract(temp_pdf_path)
-            if file_type == 0:
-                # Clean the extracted text using the Ollama model
-                with st.spinner(UI_MESSAGES["cleaning_resume"]):
-                    clean_resume_text = clean_resume(extracted_text)
-                return clean_resume_text
-            elif file_type == 1:
-                # If it's a job description, just return the extracted text
-                return extracted_text
-             
+            import fitz  # PyMuPDF, already loaded by extract_resume
+            with fitz.open(stream=file_bytes, filetype="pdf") as reader:
+                text = "".join(page.get_text() or "" for page in reader)
         except Exception as e:
-            st.warning(ERROR_MESSAGES["pdf_extraction"])
-            # Fallback to simple PyMuPDF extraction
-            file.seek(0)
-            file_bytes = file.read()
-            reader = fitz.open(stream=file_bytes, filetype="pdf")
+            logger.warning("In-process PDF extraction failed: %s", e)
             text = ""
-            for page in reader:
-                text += page.get_text() or ""
-            reader.close()
-            # If it's a resume, clean the extracted text
-            if file_type == 0:
-                # Show loading spinner
-                with st.spinner(UI_MESSAGES["cleaning_resume"]):
-                    clean_resume_text = clean_resume(text)
-                return clean_resume_text
-            # If it's a job description, just return the extracted text
-            else:
-                return text
-        finally:
-            # Always clean up the temporary file
-            if os.path.exists(temp_pdf_path):
-                os.unlink(temp_pdf_path)
-    
-    elif file.type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
-        doc = Document(file)
-        return "\n".join([para.text for para in doc.paragraphs])
-    elif file.type == "text/plain":
-        return file.read().decode("utf-8")
-    else:
+    if not text.strip():
+        st.error(ERROR_MESSAGES["pdf_no_text"])
+        return ""
+    return text
+
+def _read_docx(file_bytes: bytes):
+    """Join the paragraphs of a DOCX document."""
+    from docx import Document  # python-docx pulls in lxml, so only import it for DOCX uploads
+    doc = Document(io.BytesIO(file_bytes))
+    return "\n".join(para.text for para in doc.paragraphs)
+
+def _read_txt(file_bytes: bytes):
+    """Decode a plain text file."""
+    return file_bytes.decode("utf-8")
+
+# Readers keyed by the short file type names from FILE_TYPE_MAPPINGS
+_READERS = {
+    "pdf": _read_pdf,
+    "docx": _read_docx,
+    "txt": _read_txt,
+}
+
+@st.cache_data(show_spinner=False)
+def read_file_bytes(file_bytes: bytes, mime_type: str):
+    """Extract text from uploaded file contents; results are cached on the file bytes."""
+    reader = _READERS.get(FILE_TYPE_MAPPINGS.get(mime_type))
+    if reader is None:
         st.error(ERROR_MESSAGES["file_processing"])
         return ""
+    
+    return reader(file_bytes)
 
-def query_ollama(prompt):
-    """Query the Ollama API with the given prompt."""
-    headers = {
-        "Content-Type": "application/json"
-    }
+def submit_with_script_context(executor, fn, *args):
+    """Submit `fn(*args)` to a thread pool with the Streamlit script context attached,
+    so the worker can still use spinners, warnings and st.cache_data."""
+    ctx = get_script_run_ctx()
+
+    def run():
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return fn(*args)
+
+    return executor.submit(run)
 
-    # Payload to send to the API (including your prompt)
+@st.cache_resource
+def get_ollama_session():
+    """Shared HTTP session so Ollama calls reuse keep-alive connections across reruns."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_maxsize=OLLAMA_POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+# Letters are streamed, and decoding is capped by LETTER_OPTIONS
+LETTER_REQUEST_PARAMETERS = {
+    **MODEL_PARAMETERS,
+    "stream": True,
+    "options": {**MODEL_PARAMETERS["options"], **LETTER_OPTIONS},
+}
+
+def warm_up_model():
+    """Ask Ollama to load the model in a background thread, so the first generation
+    does not pay the model load time while the user is still uploading files."""
+    session = get_ollama_session()
+    # A generate request without a prompt only loads the model. Send the same num_ctx
+    # as real requests, since Ollama reloads the model when the context size changes
     data = {
         "model": MODEL_NAME,
-        "prompt": prompt,
-        **MODEL_PARAMETERS
+        "keep_alive": MODEL_PARAMETERS["keep_alive"],
+        "options": {"num_ctx": MODEL_PARAMETERS["options"]["num_ctx"]},
     }
 
-    try:
-        response = requests.post(OLLAMA_API_URL, headers=headers, data=json.dumps(data))
-        
-        # Check if the response is successful
-        if response.status_code == 200:
-            result = response.json()
-            print("OLLAMA RAW RESPONSE:")
-            print(repr(result['response']))  # Or use logging
-            return result['response']
+    def load():
+        try:
+            session.post(OLLAMA_API_URL, data=_json_dumps(data), headers=_JSON_HEADERS, timeout=(OLLAMA_CONNECT_TIMEOUT, OLLAMA_TIMEOUT))
+        except requests.RequestException:
+            pass  # Best effort; a real request reports connection problems
+
+    threading.Thread(target=load, daemon=True).start()
+
+def _post_with_retries(url: str, body: bytes):
+    """POST a pre-encoded streaming request, retrying connection errors and 5xx responses.
+    Retries only happen before the response is read, so no tokens are ever repeated."""
+    session = get_ollama_session()
+    for attempt in range(OLLAMA_RETRIES + 1):
+        last_attempt = attempt == OLLAMA_RETRIES
+        try:
+            response = session.post(url, data=body, headers=_JSON_HEADERS, stream=True, timeout=(OLLAMA_CONNECT_TIMEOUT, OLLAMA_TIMEOUT))
+        except requests.ConnectionError:
+            if last_attempt:
+                raise
         else:
-            error_msg = ERROR_MESSAGES["api_error"].format(
-                status_code=response.status_code,
-                error_text=response.text
-            )
-            st.error(error_msg)
-            return error_msg
+            if response.status_code < 500 or last_attempt:
+                return response
+            response.close()
+        time.sleep(OLLAMA_RETRY_BACKOFF * 2 ** attempt)
+
+def stream_ollama(url: str, data: dict, get_token):
+    """POST a streaming request to Ollama, yielding `get_token(chunk)` for each streamed JSON chunk."""
+    try:
+        # Encode the payload once; retries resend the same bytes
+        body = _json_dumps(data)
+        with _post_with_retries(url, body) as response:
+            # Check if the response is successful
+            if response.status_code != 200:
+                error_msg = ERROR_MESSAGES["api_error"].format(
+                    status_code=response.status_code,
+                    error_text=response.text
+                )
+                st.error(error_msg)
+                yield error_msg
+                return
+
+            # Ollama streams one JSON object per line until "done" is set
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = _json_loads(line)
+                yield get_token(chunk)
+                if chunk.get("done"):
+                    break
     except Exception as e:
         error_msg = ERROR_MESSAGES["general_error"].format(error=str(e))
         st.error(error_msg)
-        return error_msg
+        yield error_msg
+
+def query_ollama_chat(messages: list):
+    """Query the Ollama chat API with a message history, yielding response tokens as they arrive.
+    Ollama reuses its cache for the unchanged history prefix, so each turn only prefills the new message."""
+    data = {
+        "model": MODEL_NAME,
+        "messages": messages,
+        **LETTER_REQUEST_PARAMETERS,
+    }
+    return stream_ollama(OLLAMA_CHAT_URL, data, lambda chunk: chunk.get("message", {}).get("content", ""))
     
-def display_text(response: str, typing_speed: float = TYPING_SPEED):
-    """Display the generated text in a Streamlit app, preserving line breaks and formatting."""
+# Styled wrapper around the cover letter, looked up once instead of per render
+_LETTER_OPEN = COVER_LETTER_STYLE["container"]
+_LETTER_CLOSE = COVER_LETTER_STYLE["container_end"]
+
+def render_letter(placeholder, text: str):
+    """Render the letter text inside the styled container, escaping any HTML in it."""
+    placeholder.markdown(_LETTER_OPEN + html.escape(text) + _LETTER_CLOSE, unsafe_allow_html=True)
+
+def display_text(response, batch_chars: int = RENDER_BATCH_CHARS) -> str:
+    """Render streamed text chunks into the cover letter placeholder in batches and return the full text."""
     # Get the placeholder from session state
     placeholder = st.session_state[SESSION_KEYS["cover_letter_placeholder"]]
 
-    # Wrap everything in a centered container with nice styling
-    styled_container = COVER_LETTER_STYLE["container"]
-    closing_container = COVER_LETTER_STYLE["container_end"]
-    
-    # Simulate typing effect, preserving original line breaks
+    # Every render re-parses the whole letter, so re-render at most every RENDER_INTERVAL
+    # seconds (or right after a paragraph ends), and only after `batch_chars` new characters
     text = ""
-    for char in response:
-        text += char
-        escaped_text = html.escape(text)
-        placeholder.markdown(styled_container + escaped_text + closing_container, unsafe_allow_html=True)
-        time.sleep(typing_speed)
+    rendered_length = 0
+    last_render = 0.0  # Show the first batch as soon as it arrives
+    for chunk in response:
+        text += chunk
+        if not batch_chars or len(text) - rendered_length < batch_chars:
+            continue
+        now = time.perf_counter()
+        if now - last_render >= RENDER_INTERVAL or "\n\n" in text[-len(chunk) - 1:]:
+            # Cut at the last whitespace so words never appear half-typed
+            boundary = max(text.rfind(" "), text.rfind("\n")) + 1
+            if boundary > rendered_length:
+                render_letter(placeholder, text[:boundary])
+                rendered_length = boundary
+                last_render = now
+    
+    # Always finish with the complete text
+    render_letter(placeholder, text)
     
     # Store the final displayed text in session state to persist it
-    st.session_state[SESSION_KEYS["current_displayed_letter"]] = response
-
-def chat(generated_cover_letter: str):
-    """Handle the chat interface for cover letter personalization."""
-    if SESSION_KEYS["chat_history"] not in st.session_state:
-        st.session_state[SESSION_KEYS["chat_history"]] = [
-            {"role": "system", "content": "You are a helpful assistant for cover letter personalization."},
-            {"role": "assistant", "content": generated_cover_letter}
-        ]
+    st.session_state[SESSION_KEYS["current_displayed_letter"]] = text
+    return text
 
+@st.fragment
+def chat():
+    """Handle the chat interface for cover letter personalization.
+    Runs as a fragment, so personalization only reruns this function, not the whole app."""
     user_input = st.text_input(UI_MESSAGES["personalization_input"])
 
     if st.button(UI_MESSAGES["personalization_button"]) and user_input.strip():
-        # Add user message to chat history
-        st.session_state[SESSION_KEYS["chat_history"]].append({"role": "user", "content": user_input})
-
-        # Build a prompt with chat history for context
-        chat_prompt = PERSONALIZATION_PROMPT_TEMPLATE.format(
-            current_cover_letter=st.session_state[SESSION_KEYS["chat_history"]][-2]['content'],
-            user_request=user_input
-        )
+        history = st.session_state[SESSION_KEYS["chat_history"]]
+        # Send only the system prompt, the original resume + job description turn, the latest
+        # letter and the new request. Older turns would overflow num_ctx, and Ollama would
+        # then drop the oldest messages first, i.e. the resume. The first two messages stay
+        # byte-identical, so Ollama still reuses its cache for them
+        messages = history[:2] + [
+            history[-1],
+            {"role": "user", "content": PERSONALIZATION_PROMPT_TEMPLATE.format_map({"user_request": user_input})},
+        ]
 
         # Show loading spinner for personalization
         with st.spinner(UI_MESSAGES["personalizing_letter"]):
-            # Get the updated cover letter from Ollama
-            updated_letter = query_ollama(chat_prompt)
-            st.session_state[SESSION_KEYS["chat_history"]].append({"role": "assistant", "content": updated_letter})
-
-            # Update the cover letter display at the top
-            display_text(updated_letter)
+            # Stream the updated cover letter from Ollama into the display at the top
+            updated_letter = display_text(query_ollama_chat(messages))
+            # Keep the same shape for the next turn: system, original prompt, latest letter
+            st.session_state[SESSION_KEYS["chat_history"]] = history[:2] + [
+                {"role": "assistant", "content": updated_letter}
+            ]
 
     # Always ensure the current letter is displayed
     elif SESSION_KEYS["current_displayed_letter"] in st.session_state:
-        styled_container = COVER_LETTER_STYLE["container"]
-        closing_container = COVER_LETTER_STYLE["container_end"]
-        st.session_state[SESSION_KEYS["cover_letter_placeholder"]].markdown(
-            styled_container + st.session_state[SESSION_KEYS["current_displayed_letter"]] + closing_container, 
-            unsafe_allow_html=True
+        render_letter(
+            st.session_state[SESSION_KEYS["cover_letter_placeholder"]],
+            st.session_state[SESSION_KEYS["current_displayed_letter"]]
         )
 
+    # Saving is an explicit user action rather than a server-side file write
+    st.download_button(
+        UI_MESSAGES["download_button"],
+        st.session_state[SESSION_KEYS["current_displayed_letter"]],
+        file_name=DOWNLOAD_FILE_NAME,
+        mime="text/plain"
+    )
+
 def initialize_session_state():
     """Initialize all session state variables."""
     session_defaults = {
         SESSION_KEYS["cover_letter_placeholder"]: st.empty(),
-        SESSION_KEYS["processed_resume_text"]: "",
-        SESSION_KEYS["processed_job_description"]: "",
-        SESSION_KEYS["last_resume_file_name"]: "",
-        SESSION_KEYS["last_job_file_name"]: "",
     }
     
     for key, default_value in session_defaults.items():
         if key not in st.session_state:
             st.session_state[key] = default_value
 
+    # Start loading the model once per session
+    if not st.session_state.get(SESSION_KEYS["model_warmed"]):
+        warm_up_model()
+        st.session_state[SESSION_KEYS["model_warmed"]] = True
+
 def main():
     """Main application function."""
     st.markdown(
@@ -227,6 +416,9 @@ def main():
     
     st.markdown("---")
     
+    # Styles for the cover letter container, sent once instead of with every update
+    st.markdown(COVER_LETTER_STYLE["css"], unsafe_allow_html=True)
+    
     # Initialize session state
     initialize_session_state()
     
@@ -261,39 +453,21 @@ def main():
     resume_text = resume_text_input.strip() if resume_text_input else ""    
     job_description = job_description_input.strip() if job_description_input else ""
 
-    # Process resume file only if no text is pasted and file has changed
-    if resume_file and not resume_text:
-        current_resume_file_name = resume_file.name
-        # Only process if it's a new file or not processed before
-        if (current_resume_file_name != st.session_state[SESSION_KEYS["last_resume_file_name"]] or 
-            not st.session_state[SESSION_KEYS["processed_resume_text"]]):
-            resume_text = read_file(resume_file, 0)
-            st.session_state[SESSION_KEYS["processed_resume_text"]] = resume_text
-            st.session_state[SESSION_KEYS["last_resume_file_name"]] = current_resume_file_name
-        else:
-            # Use cached processed text
-            resume_text = st.session_state[SESSION_KEYS["processed_resume_text"]]
-    
-    # Process job description file only if no text is pasted and file has changed
-    if job_file and not job_description:
-        current_job_file_name = job_file.name
-        # Only process if it's a new file or not processed before
-        if (current_job_file_name != st.session_state[SESSION_KEYS["last_job_file_name"]] or 
-            not st.session_state[SESSION_KEYS["processed_job_description"]]):
-            job_description = read_file(job_file, 1)
-            st.session_state[SESSION_KEYS["processed_job_description"]] = job_description
-            st.session_state[SESSION_KEYS["last_job_file_name"]] = current_job_file_name
-        else:
-            # Use cached processed text
-            job_description = st.session_state[SESSION_KEYS["processed_job_description"]]
-
-    # Clear cached data when text is pasted (overrides file upload)
-    if resume_text_input.strip():
-        st.session_state[SESSION_KEYS["processed_resume_text"]] = ""
-        st.session_state[SESSION_KEYS["last_resume_file_name"]] = ""
-    if job_description_input.strip():
-        st.session_state[SESSION_KEYS["processed_job_description"]] = ""
-        st.session_state[SESSION_KEYS["last_job_file_name"]] = ""
+    # Files are only read when no text is pasted; read_file_bytes caches on the file
+    # contents, so unchanged uploads are served from cache on every rerun
+    process_resume = bool(resume_file and not resume_text)
+    process_job = bool(job_file and not job_description)
+
+    # Reading the resume and the job description are independent,
+    # so run them side by side instead of one after the other
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        resume_future = submit_with_script_context(executor, read_file, resume_file) if process_resume else None
+        job_future = submit_with_script_context(executor, read_file, job_file) if process_job else None
+
+        if resume_future:
+            resume_text = resume_future.result()
+        if job_future:
+            job_description = job_future.result()
     
     # Check if both files are uploaded
     if not resume_text:
@@ -324,22 +498,29 @@ def main():
         if create_button and resume_text and job_description:
             # Show loading spinner
             with st.spinner(UI_MESSAGES["generating_letter"]):
-                prompt = generate_cover_letter_prompt(resume_text, job_description)
-                print(f"Generated prompt: {prompt}")  # Debugging line
-                generated_cover_letter = query_ollama(prompt)
+                # Messy resume extractions get tidied by the model in the same request;
+                # clean ones (most ATS exports) use the shorter plain prompt
+                if process_resume and _needs_cleaning(resume_text):
+                    prompt = generate_combined_prompt(resume_text, job_description)
+                else:
+                    prompt = generate_cover_letter_prompt(resume_text, job_description)
+                logger.debug("Prompt length=%d", len(prompt))
+                messages = [
+                    {"role": "system", "content": COVER_LETTER_SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ]
+                # Stream the letter into the display as it is generated
+                generated_cover_letter = display_text(query_ollama_chat(messages))
                 
                 # Store the generated cover letter in session state
                 st.session_state[SESSION_KEYS["generated_cover_letter"]] = generated_cover_letter
                 st.session_state[SESSION_KEYS["cover_letter_generated"]] = True
                 
-                # Initialize chat history
-                st.session_state[SESSION_KEYS["chat_history"]] = [
-                    {"role": "system", "content": "You are a helpful assistant for cover letter personalization."},
+                # Personalization continues this conversation, so its turns share the
+                # cached prefix and the model still sees the resume and job description
+                st.session_state[SESSION_KEYS["chat_history"]] = messages + [
                     {"role": "assistant", "content": generated_cover_letter}
                 ]
-                
-                # Display the letter
-                display_text(generated_cover_letter)
 
         # Display existing cover letter if already generated
         elif SESSION_KEYS["cover_letter_generated"] in st.session_state and st.session_state[SESSION_KEYS["cover_letter_generated"]]:
@@ -349,20 +530,15 @@ def main():
             else:
                 current_letter = st.session_state[SESSION_KEYS["chat_history"]][-1]["content"]
                 st.session_state[SESSION_KEYS["current_displayed_letter"]] = current_letter
-                
-            styled_container = COVER_LETTER_STYLE["container"]
-            closing_container = COVER_LETTER_STYLE["container_end"]
-            st.session_state[SESSION_KEYS["cover_letter_placeholder"]].markdown(
-                styled_container + current_letter + closing_container, 
-                unsafe_allow_html=True
-            )
+
+            render_letter(st.session_state[SESSION_KEYS["cover_letter_placeholder"]], current_letter)
 
         # Show personalization chat only after cover letter is generated
         if SESSION_KEYS["cover_letter_generated"] in st.session_state and st.session_state[SESSION_KEYS["cover_letter_generated"]]:
             # Add a chat interface for further personalization
             st.markdown("---")
             st.header(UI_MESSAGES["personalization_header"])
-            chat(st.session_state[SESSION_KEYS["generated_cover_letter"]])
+            chat()
         
     st.info(UI_MESSAGES["Note"], icon="ℹ️")
 
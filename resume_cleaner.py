@@ -5,42 +5,58 @@ This module imports configuration from config.py for consistency.
 """
 
 import re
+import logging
 import requests
-import json
 from config import (
     OLLAMA_API_URL,
+    OLLAMA_TIMEOUT,
+    OLLAMA_CONNECT_TIMEOUT,
     MODEL_NAME,
     MODEL_PARAMETERS,
     RESUME_CLEANING_PROMPT_TEMPLATE,
-    ERROR_MESSAGES
+    ERROR_MESSAGES,
+    DEBUG_DUMP
 )
 
+logger = logging.getLogger(__name__)
 
+# Keyword groups for the resume checks. Unanchored, so they match anywhere in a word
+# ("projects", "teamwork") like the substring checks they replace
+_RESUME_KEYWORD_RE = re.compile(
+    r"(experience|education|skills|work|employment|university|college|degree|certification|project)",
+    re.IGNORECASE,
+)
+# One pattern for all section checks; the named group that matched tells which section was seen
+_SECTION_KEYWORD_RE = re.compile(
+    r"(?P<contact_info>@|email|phone|linkedin)"
+    r"|(?P<experience>experience|work|employment|job)"
+    r"|(?P<education>education|university|college|degree)"
+    r"|(?P<skills>skills|technology|programming|software)",
+    re.IGNORECASE,
+)
+
+# Patterns used to pull the cleaned resume out of the model's reply
+_DASH_RE = re.compile(r"---\s*\n(.*?)\n---", re.DOTALL)
+_HERE_IS_RE = re.compile(r"(Here (is|’s|s the)[^\n]*:\s*\n+)(.*)", re.IGNORECASE | re.DOTALL)
+_THINK_RE = re.compile(r"<think>.*?</think>", re.DOTALL | re.IGNORECASE)
 
 def extract_between_dashes(response: str) -> str:
     """
     Extracts only the content between the first two lines containing '---' in the response.
     Returns an empty string if the pattern is not found.
     """
-    dash_match = re.search(r"---\s*\n(.*?)\n---", response, flags=re.DOTALL)
+    dash_match = _DASH_RE.search(response)
     if dash_match:
         return dash_match.group(1).strip()
 
     # Try to extract content after "Here is the" phrase
-    here_is_match = re.search(r"(Here (is|’s|s the)[^\n]*:\s*\n+)(.*)", response, flags=re.IGNORECASE | re.DOTALL)
+    here_is_match = _HERE_IS_RE.search(response)
     if here_is_match:
         return here_is_match.group(3).strip()
 
     # Fallback: Remove any <think>...</think> block and return the rest
-    fallback = re.sub(r"<think>.*?</think>", "", response, flags=re.DOTALL | re.IGNORECASE).strip()
-    if fallback:
-        # Remove any leading/trailing whitespace and return
-        fallback = re.sub(r"^\s+|\s+$", "", fallback)
-        if fallback:
-            return fallback
-    else:
-        return fallback if fallback else "No valid content found."  
-    # return fallback 
+    fallback = _THINK_RE.sub("", response).strip()
+    return fallback if fallback else "No valid content found."
     
 
 def clean_resume(resume_text: str) -> str:
@@ -57,12 +73,8 @@ def clean_resume(resume_text: str) -> str:
         return ""
     
     # Generate the cleaning prompt using the template from config
-    prompt = RESUME_CLEANING_PROMPT_TEMPLATE.format(resume_text=resume_text)
+    prompt = RESUME_CLEANING_PROMPT_TEMPLATE.format_map({"resume_text": resume_text})
     
-    headers = {
-        "Content-Type": "application/json"
-    }
-
     # Payload to send to the API
     data = {
         "model": MODEL_NAME,
@@ -71,29 +83,29 @@ def clean_resume(resume_text: str) -> str:
     }
 
     try:
-        response = requests.post(OLLAMA_API_URL, headers=headers, data=json.dumps(data))
+        response = requests.post(OLLAMA_API_URL, json=data, timeout=(OLLAMA_CONNECT_TIMEOUT, OLLAMA_TIMEOUT))
         
         # Check if the response is successful
         if response.status_code == 200:
             result = response.json()
-            print("OLLAMA RAW RESPONSE befire cleaming resume:")
-            repr(result['response'])  # Or use logging
+            logger.debug("Resume cleaning response length=%d", len(result['response']))
             cleaned_cover_letter = extract_between_dashes(result['response'])
-            with open("generated_resume_cleaned.txt", "w", encoding="utf-8") as f:
-                f.write(cleaned_cover_letter)
+            if DEBUG_DUMP:
+                with open("generated_resume_cleaned.txt", "w", encoding="utf-8") as f:
+                    f.write(cleaned_cover_letter)
             return cleaned_cover_letter
         else:
             error_msg = ERROR_MESSAGES["api_error"].format(
                 status_code=response.status_code,
                 error_text=response.text
             )
-            print(f"Resume cleaning error: {error_msg}")
+            logger.warning("Resume cleaning error: %s", error_msg)
             # Return original text if cleaning fails
             return resume_text
             
     except Exception as e:
         error_msg = ERROR_MESSAGES["general_error"].format(error=str(e))
-        print(f"Resume cleaning error: {error_msg}")
+        logger.warning("Resume cleaning error: %s", error_msg)
         # Return original text if cleaning fails
         return resume_text
 
@@ -110,17 +122,15 @@ def validate_resume_text(resume_text: str) -> bool:
     if not resume_text or len(resume_text.strip()) < 50:
         return False
     
-    # Check for common resume sections/keywords
-    resume_keywords = [
-        'experience', 'education', 'skills', 'work', 'employment',
-        'university', 'college', 'degree', 'certification', 'project'
-    ]
-    
-    text_lower = resume_text.lower()
-    keyword_count = sum(1 for keyword in resume_keywords if keyword in text_lower)
+    # Count distinct resume keywords, stopping as soon as two are found
+    found = set()
+    for match in _RESUME_KEYWORD_RE.finditer(resume_text):
+        found.add(match.group(1).lower())
+        if len(found) >= 2:
+            break
     
     # Resume should contain at least 2 common keywords
-    return keyword_count >= 2
+    return len(found) >= 2
 
 def extract_key_sections(resume_text: str) -> dict:
     """
@@ -140,19 +150,13 @@ def extract_key_sections(resume_text: str) -> dict:
         'has_skills': False
     }
     
-    text_lower = resume_text.lower()
-    
-    # Check for different sections
-    if any(keyword in text_lower for keyword in ['email', 'phone', 'linkedin', '@']):
-        sections['has_contact_info'] = True
-    
-    if any(keyword in text_lower for keyword in ['experience', 'work', 'employment', 'job']):
-        sections['has_experience'] = True
-    
-    if any(keyword in text_lower for keyword in ['education', 'university', 'college', 'degree']):
-        sections['has_education'] = True
-    
-    if any(keyword in text_lower for keyword in ['skills', 'technology', 'programming', 'software']):
-        sections['has_skills'] = True
+    # Check for different sections in a single pass, stopping once all four are found
+    found = set()
+    for match in _SECTION_KEYWORD_RE.finditer(resume_text):
+        found.add(match.lastgroup)
+        if len(found) == 4:
+            break
+    for section in found:
+        sections['has_' + section] = True
     
     return sections